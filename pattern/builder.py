@@ -2,14 +2,37 @@ from abc import ABC
 
 
 class Phone:
-    def __init__(self):
-        self.data: str = ''
+    def __init__(self, parts: list[str] = None):
+        self.parts: list[str] = parts if parts is not None else []
+        self.__joined: str = None
+
+    @property
+    def data(self) -> str:
+        return self.about_phone()
 
     def about_phone(self) -> str:
-        return self.data
+        if self.__joined is None:
+            self.__joined = ''.join(self.parts)
+        return self.__joined
+
+    def append_data(self, data: str) -> None:
+        self.parts.append(data)
+        self.__joined = None
+
+
+class FrozenPhone(Phone):
+    # immutable product: cache hits share one parts tuple, derive() copies only that tuple
+    def __init__(self, parts: tuple[str, ...]):
+        super().__init__()
+        self.parts: tuple[str, ...] = tuple(parts)
 
     def append_data(self, data: str) -> None:
-        self.data += data
+        raise TypeError("FrozenPhone is immutable, use derive() to make a variant")
+
+    def derive(self, index: int, part: str) -> "FrozenPhone":
+        parts = list(self.parts)
+        parts[index] = part
+        return FrozenPhone(tuple(parts))
 
 
 class IDeveloper(ABC):
@@ -26,71 +49,81 @@ class IDeveloper(ABC):
         pass
 
 
-class AndroidDeveloper(IDeveloper):
+class BrandDeveloper(IDeveloper):
+    brand: str = ''
+
     def __init__(self):
         self.__phone = Phone()
 
     def create_display(self):
-        self.__phone.append_data("Created display Samsung\n")
+        self.__phone.append_data(f"Created display {self.brand}\n")
 
     def create_box(self):
-        self.__phone.append_data("Created box Samsung\n")
+        self.__phone.append_data(f"Created box {self.brand}\n")
 
     def system_install(self):
-        self.__phone.append_data("Installed system Samsung\n")
+        self.__phone.append_data(f"Installed system {self.brand}\n")
 
     def get_phone(self) -> Phone:
         return self.__phone
 
-class IphoneDeveloper(IDeveloper):
-    def __init__(self):
-        self.__phone = Phone()
 
-    def create_display(self):
-        self.__phone.append_data("Created display Iphone\n")
+class AndroidDeveloper(BrandDeveloper):
+    brand = "Samsung"
 
-    def create_box(self):
-        self.__phone.append_data("Created box Iphone\n")
 
-    def system_install(self):
-        self.__phone.append_data("Installed system Iphone\n")
+class IphoneDeveloper(BrandDeveloper):
+    brand = "Iphone"
 
-    def get_phone(self) -> Phone:
-        return self.__phone
 
-class HuaweiDeveloper(IDeveloper):
-    def __init__(self):
-        self.__phone = Phone()
-
-    def create_display(self):
-        self.__phone.append_data("Created display Huawei\n")
-
-    def create_box(self):
-        self.__phone.append_data("Created box Huawei\n")
+class HuaweiDeveloper(BrandDeveloper):
+    brand = "Huawei"
 
-    def system_install(self):
-        self.__phone.append_data("Installed system Huawei\n")
-
-    def get_phone(self) -> Phone:
-        return self.__phone
 
 class Director:
-    def __init__(self, developer: IDeveloper):
+    ONLY_PHONE = ("create_box", "create_display")
+    FULL_PHONE = ("create_box", "create_display", "system_install")
+
+    def __init__(self, developer: IDeveloper, cache: bool = False):
         self.__developer = developer
+        self.__cache = cache
+        self.__compiled: dict[tuple[type, tuple[str, ...]], tuple[str, ...]] = {}
+        self.__products: dict[tuple[type, tuple[str, ...]], FrozenPhone] = {}
 
     def set_developer(self, developer: IDeveloper):
         self.__developer = developer
 
+    def __mount(self, recipe: tuple[str, ...]) -> Phone:
+        if self.__cache:
+            key = (type(self.__developer), recipe)
+            phone = self.__products.get(key)
+            if phone is None:
+                phone = self.__products[key] = FrozenPhone(self.compile_recipe(*key))
+            return phone
+        for step in recipe:
+            getattr(self.__developer, step)()
+        return self.__developer.get_phone()
+
     def mount_only_phone(self) -> Phone:
-        self.__developer.create_box()
-        self.__developer.create_display()
-        return  self.__developer.get_phone()
+        return self.__mount(self.ONLY_PHONE)
 
     def mount_full_phone(self) -> Phone:
-        self.__developer.create_box()
-        self.__developer.create_display()
-        self.__developer.system_install()
-        return self.__developer.get_phone()
+        return self.__mount(self.FULL_PHONE)
+
+    def compile_recipe(self, developer_cls: type, recipe: tuple[str, ...]) -> tuple[str, ...]:
+        # steps are dispatched once per (developer, recipe); builds then copy the resulting parts
+        key = (developer_cls, tuple(recipe))
+        parts = self.__compiled.get(key)
+        if parts is None:
+            developer = developer_cls()
+            for step in recipe:
+                getattr(developer, step)()
+            parts = self.__compiled[key] = tuple(developer.get_phone().parts)
+        return parts
+
+    def build_many(self, developer_cls: type, n: int, recipe: tuple[str, ...] = FULL_PHONE) -> list[Phone]:
+        parts = self.compile_recipe(developer_cls, recipe)
+        return [Phone(list(parts)) for _ in range(n)]
 
 
 if __name__ == "__main__":
@@ -110,4 +143,12 @@ if __name__ == "__main__":
     huawei: Phone = director.mount_only_phone()
     print(huawei.about_phone())
 
+    phones = director.build_many(HuaweiDeveloper, 1000, Director.FULL_PHONE)
+    print(len(phones))
+    print(phones[-1].about_phone())
 
+    cached_director = Director(AndroidDeveloper(), cache=True)
+    first = cached_director.mount_full_phone()
+    second = cached_director.mount_full_phone()
+    print(first is second)
+    print(first.derive(2, "Installed system Android 15\n").about_phone())
@@ -1,48 +1,287 @@
-from abc import ABC, abstractmethod
+import asyncio
+import copy
+import time
+from abc import ABC
+from collections import OrderedDict
+
+CONTINUE = object()
 
 
 class IHandler(ABC):
+    # handlers whose outcome depends only on cache_key(request) may set it to enable memoization
+    cache_key = None
 
     def __init__(self):
+        if type(self).process is IHandler.process and type(self).handle is IHandler.handle:
+            raise TypeError(f"{self.__class__.__name__} must implement process() (or handle())")
         self.next_ = None
 
+    @property
+    def legacy(self) -> bool:
+        # handlers written before process() existed override handle() and forward to next_ themselves
+        return type(self).process is IHandler.process
+
     def set_next_handler(self, next_: "IHandler"):
         self.next_ = next_
         return self.next_
 
-    @abstractmethod
     def handle(self, request):
-        raise NotImplementedError(f"{self.__class__.__name__} is an abstract class")
+        result = self.process(request)
+        if result is not CONTINUE:
+            return result
+        if self.next_:
+            return self.next_.handle(request)
+        return self.default(request)
+
+    def process(self, request):
+        return self.handle(request)
+
+    def default(self, request):
+        return None
+
+    def handle_batch(self, requests: list) -> list:
+        return compile_chain(self, profile=False).handle_batch(requests)
+
+    def process_batch(self, requests: list) -> list:
+        return [self.process(request) for request in requests]
+
+    async def aprocess(self, request):
+        return self.process(request)
+
+    async def aprocess_batch(self, requests: list) -> list:
+        # I/O-bound handlers override aprocess, gather lets their awaits overlap
+        return await asyncio.gather(*(self.aprocess(request) for request in requests))
 
 
 class AuthHandler(IHandler):
+    cache_key = staticmethod(lambda request: request.get("user"))
 
-    def handle(self, request):
+    def process(self, request):
         print("auth request received")
         if not request.get("user"):
             return {"error": "user is required"}
-        if self.next_:
-            return self.next_.handle(request)
-        return None
+        return CONTINUE
+
+    def process_batch(self, requests: list) -> list:
+        print(f"auth batch of {len(requests)} requests received")
+        error = {"error": "user is required"}
+        return [CONTINUE if request.get("user") else dict(error) for request in requests]
 
 
 class LoginHandler(IHandler):
-    def handle(self, request):
+    cache_key = staticmethod(lambda request: None)
+
+    def process(self, request):
         print("login request received")
-        if self.next_:
-            return self.next_.handle(request)
-        return None
+        return CONTINUE
 
 
 class BusinessHandler(IHandler):
-    def handle(self, request):
+    cache_key = staticmethod(lambda request: (request.get("user"), request.get("action")))
+
+    def process(self, request):
         if request.get("action") != 'processing':
             return {"message": f"Business not Processing by {request.get('user')}"}
-        if self.next_:
-            return self.next_.handle(request)
+        return CONTINUE
+
+    def default(self, request):
         return {"message": f"{request.get('user')} can do anything"}
 
 
+class CompiledChain:
+    def __init__(self, handlers: list[IHandler], profile: bool = True):
+        self.handlers = tuple(handlers)
+        self.steps = tuple(h.process for h in self.handlers)
+        self.terminal = self.handlers[-1].default
+        self.profile = profile
+        self.calls = [0] * len(self.handlers)
+        self.rejections = [0] * len(self.handlers)
+        self.seconds = [0.0] * len(self.handlers)
+
+    def handle(self, request):
+        if not self.profile:
+            for step in self.steps:
+                result = step(request)
+                if result is not CONTINUE:
+                    return result
+            return self.terminal(request)
+        calls, rejections, seconds = self.calls, self.rejections, self.seconds
+        for i, step in enumerate(self.steps):
+            started = time.perf_counter()
+            result = step(request)
+            seconds[i] += time.perf_counter() - started
+            calls[i] += 1
+            if result is not CONTINUE:
+                rejections[i] += 1
+                return result
+        return self.terminal(request)
+
+    def _run_batch(self, requests: list):
+        # shared by the sync and async drivers: yields (handler, survivors), receives their outcomes
+        results = [None] * len(requests)
+        alive = list(range(len(requests)))
+        for i, handler in enumerate(self.handlers):
+            if not alive:
+                return results
+            started = time.perf_counter()
+            out = yield handler, [requests[j] for j in alive]
+            self.seconds[i] += time.perf_counter() - started
+            self.calls[i] += len(alive)
+            survivors = []
+            for j, result in zip(alive, out):
+                if result is CONTINUE:
+                    survivors.append(j)
+                else:
+                    results[j] = result
+            self.rejections[i] += len(alive) - len(survivors)
+            alive = survivors
+        for j in alive:
+            results[j] = self.terminal(requests[j])
+        return results
+
+    def handle_batch(self, requests: list) -> list:
+        # each handler sees the whole surviving batch, results keep the input order
+        run = self._run_batch(requests)
+        try:
+            handler, batch = next(run)
+            while True:
+                handler, batch = run.send(handler.process_batch(batch))
+        except StopIteration as stop:
+            return stop.value
+
+    async def ahandle(self, request):
+        return (await self.ahandle_batch([request]))[0]
+
+    async def ahandle_batch(self, requests: list) -> list:
+        run = self._run_batch(requests)
+        try:
+            handler, batch = next(run)
+            while True:
+                handler, batch = run.send(await handler.aprocess_batch(batch))
+        except StopIteration as stop:
+            return stop.value
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "handler": h.__class__.__name__,
+                "calls": self.calls[i],
+                "rejections": self.rejections[i],
+                "seconds": self.seconds[i],
+            }
+            for i, h in enumerate(self.handlers)
+        ]
+
+
+def compile_chain(head: IHandler, profile: bool = True) -> CompiledChain:
+    # walks next_ iteratively, so the chain length is not bounded by the recursion limit
+    handlers = []
+    handler = head
+    while handler is not None:
+        handlers.append(handler)
+        if handler.legacy:
+            # its handle() already runs the rest of the chain and never returns CONTINUE
+            break
+        handler = handler.next_
+    return CompiledChain(handlers, profile)
+
+
+class CachedChain:
+    def __init__(self, chain: CompiledChain, capacity: int = 1024, ttl: float = None):
+        self.chain = chain
+        self.capacity = capacity
+        self.ttl = ttl
+        keys = [h.cache_key for h in chain.handlers]
+        # the chain is only memoizable when every stage declares its key
+        self.keys = tuple(keys) if all(k is not None for k in keys) else None
+        self.cache: OrderedDict = OrderedDict()
+        self.by_user: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, request):
+        if self.keys is None:
+            return None
+        return tuple(k(request) for k in self.keys)
+
+    def lookup(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return CONTINUE
+        result, stored_at, _ = entry
+        if self.ttl is not None and time.time() - stored_at >= self.ttl:
+            self.forget(key)
+            return CONTINUE
+        self.cache.move_to_end(key)
+        return copy.deepcopy(result)
+
+    def store(self, key, request, result):
+        user = request.get("user")
+        self.cache[key] = (copy.deepcopy(result), time.time(), user)
+        self.cache.move_to_end(key)
+        self.by_user.setdefault(user, set()).add(key)
+        while len(self.cache) > self.capacity:
+            self.forget(next(iter(self.cache)))
+
+    def forget(self, key):
+        _, _, user = self.cache.pop(key)
+        keys = self.by_user[user]
+        keys.discard(key)
+        if not keys:
+            del self.by_user[user]
+
+    def invalidate_user(self, user):
+        for key in list(self.by_user.get(user, ())):
+            self.forget(key)
+
+    def handle(self, request):
+        key = self.key(request)
+        if key is None:
+            return self.chain.handle(request)
+        result = self.lookup(key)
+        if result is not CONTINUE:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self.chain.handle(request)
+        self.store(key, request, result)
+        return result
+
+    def handle_batch(self, requests: list) -> list:
+        results = [None] * len(requests)
+        # identical requests inside one batch are computed once
+        missed: dict = {}
+        uncacheable = []
+        for i, request in enumerate(requests):
+            key = self.key(request)
+            if key is None:
+                uncacheable.append(i)
+                continue
+            if key in missed:
+                missed[key].append(i)
+                continue
+            result = self.lookup(key)
+            if result is CONTINUE:
+                missed[key] = [i]
+            else:
+                self.hits += 1
+                results[i] = result
+        self.misses += len(missed) + len(uncacheable)
+        todo = [indexes[0] for indexes in missed.values()] + uncacheable
+        computed = self.chain.handle_batch([requests[i] for i in todo])
+        for i, result in zip(uncacheable, computed[len(missed):]):
+            results[i] = result
+        for (key, indexes), result in zip(missed.items(), computed):
+            self.store(key, requests[indexes[0]], result)
+            self.hits += len(indexes) - 1
+            for i in indexes:
+                results[i] = copy.deepcopy(result)
+        return results
+
+    def stats(self) -> dict:
+        return {"size": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+
 if __name__ == "__main__":
     auth = AuthHandler()
     login = LoginHandler()
@@ -56,3 +295,18 @@ if __name__ == "__main__":
     for request in requests:
         res = auth.handle(request)
         print(res)
+
+    chain = compile_chain(auth)
+    for request in requests:
+        print(chain.handle(request))
+    print(chain.stats())
+
+    print(auth.handle_batch(requests))
+    print(asyncio.run(chain.ahandle_batch(requests)))
+
+    cached = CachedChain(chain, capacity=128, ttl=60)
+    print(cached.handle_batch(requests + requests))
+    print(cached.handle(requests[2]))
+    cached.invalidate_user("Behroz")
+    print(cached.handle(requests[2]))
+    print(cached.stats())
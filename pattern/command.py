@@ -1,4 +1,8 @@
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 
 class ICommand(ABC):
@@ -6,6 +10,10 @@ class ICommand(ABC):
     def execute(self):
         pass
 
+    @property
+    def receiver(self):
+        return None
+
 
 class Light:
     @staticmethod
@@ -24,6 +32,10 @@ class LightOnCommand(ICommand):
     def execute(self):
         self.light.turn_on()
 
+    @property
+    def receiver(self):
+        return self.light
+
 
 class LightOffCommand(ICommand):
     def __init__(self, light_: Light):
@@ -32,6 +44,10 @@ class LightOffCommand(ICommand):
     def execute(self):
         self.light.turn_off()
 
+    @property
+    def receiver(self):
+        return self.light
+
 
 class RemoteControl:
     @staticmethod
@@ -39,6 +55,115 @@ class RemoteControl:
         command.execute()
 
 
+def _execute(command: ICommand):
+    return command.execute()
+
+
+class CommandExecutor:
+    def __init__(self, workers: int = 4, processes: bool = False):
+        # process mode pickles each command and runs it against a copy of its receiver,
+        # so it only suits stateless receivers; receiver state changes stay in the child
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._pool = pool(max_workers=workers)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._local = threading.local()
+        # one lane per receiver: the next command is submitted only after the previous one finished
+        self._lanes: dict[object, deque] = {}
+        self._started = time.perf_counter()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def submit(self, command: ICommand) -> Future:
+        future = Future()
+        item = (command, future, time.perf_counter())
+        key = command.receiver
+        if key is None:
+            key = object()
+        with self._lock:
+            self._submitted += 1
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append(item)
+                return future
+            self._lanes[key] = deque([item])
+        self._kick(key)
+        return future
+
+    def _kick(self, key):
+        # a command that finishes before add_done_callback returns calls back on this thread;
+        # queue that lane here instead of nesting another _advance
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending.append(key)
+            return
+        self._local.pending = pending = [key]
+        try:
+            while pending:
+                self._advance(pending.pop())
+        finally:
+            self._local.pending = None
+
+    def _advance(self, key):
+        # loops over cancelled commands instead of recursing, then submits the next live one
+        while True:
+            with self._lock:
+                lane = self._lanes[key]
+                if not lane:
+                    del self._lanes[key]
+                    return
+                item = lane.popleft()
+            command, future, _ = item
+            if future.set_running_or_notify_cancel():
+                inner = self._pool.submit(_execute, command)
+                inner.add_done_callback(lambda done: self._finish(key, item, done))
+                return
+            with self._lock:
+                self._completed += 1
+                self._cancelled += 1
+                self._idle.notify_all()
+
+    def _finish(self, key, item, done: Future):
+        _, future, submitted_at = item
+        latency = time.perf_counter() - submitted_at
+        error = done.exception()
+        with self._lock:
+            self._completed += 1
+            self._failed += error is not None
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self._idle.notify_all()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result())
+        self._kick(key)
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            with self._idle:
+                self._idle.wait_for(lambda: self._completed == self._submitted)
+        self._pool.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            return {
+                "queue_depth": self._submitted - self._completed,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "throughput": self._completed / elapsed if elapsed else 0.0,
+                "latency_avg": self._latency_total / self._completed if self._completed else 0.0,
+                "latency_max": self._latency_max,
+            }
+
+
 if __name__ == "__main__":
     light = Light()
     on = LightOnCommand(light)
@@ -48,3 +173,10 @@ if __name__ == "__main__":
 
     remote.press(on)
     remote.press(off)
+
+    executor = CommandExecutor(workers=4)
+    futures = [executor.submit(on if i % 2 == 0 else off) for i in range(6)]
+    for future in futures:
+        future.result()
+    executor.shutdown()
+    print(executor.stats())
@@ -1,8 +1,15 @@
+import os
+import threading
 from abc import ABC, abstractmethod
+from collections import deque
 from typing import Deque
 
 
 class ICommand(ABC):
+    # names of the receiver operations behind positive/negative, used by the journal
+    positive_op: str = None
+    negative_op: str = None
+
     @abstractmethod
     def positive(self):
         pass
@@ -11,25 +18,59 @@ class ICommand(ABC):
     def negative(self):
         pass
 
+    @property
+    def receiver(self):
+        return None
+
 
 class Conveyor:
+    operations = ("on", "off", "speed_increase", "speed_decrease")
+
+    def __init__(self, name: str = "conveyor"):
+        self.name = name
+        self.running = False
+        self.speed = 0
+
+    def apply(self, op: str):
+        if op == "on":
+            self.running = True
+        elif op == "off":
+            self.running = False
+        elif op == "speed_increase":
+            self.speed += 1
+        elif op == "speed_decrease":
+            self.speed -= 1
+        else:
+            raise ValueError(f"unknown conveyor operation: {op}")
+
     def on(self):
         print("Conveyor on")
+        self.apply("on")
 
     def off(self):
         print("Conveyor off")
+        self.apply("off")
 
     def speed_increase(self):
         print("Speed increase")
+        self.apply("speed_increase")
 
     def speed_decrease(self):
         print("Speed decrease")
+        self.apply("speed_decrease")
 
 
 class ConveyorWorkCommand(ICommand):
+    positive_op = "on"
+    negative_op = "off"
+
     def __init__(self, conveyor: Conveyor):
         self.conveyor: Conveyor = conveyor
 
+    @property
+    def receiver(self):
+        return self.conveyor
+
     def positive(self):
         self.conveyor.on()
 
@@ -38,9 +79,16 @@ class ConveyorWorkCommand(ICommand):
 
 
 class ConveyorAdjustCommand(ICommand):
+    positive_op = "speed_increase"
+    negative_op = "speed_decrease"
+
     def __init__(self, conveyor: Conveyor):
         self.conveyor: Conveyor = conveyor
 
+    @property
+    def receiver(self):
+        return self.conveyor
+
     def positive(self):
         self.conveyor.speed_increase()
 
@@ -48,21 +96,187 @@ class ConveyorAdjustCommand(ICommand):
         self.conveyor.speed_decrease()
 
 
+class CommandJournal:
+    # one record per line: "<conveyor name> <op>" or "snapshot <conveyor name> <running> <speed>"
+    def __init__(self, path: str, batch_size: int = 64, interval: float = 0.05, compact_every: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.compact_every = compact_every
+        self.__lock = threading.RLock()
+        self.__file = open(path, "a", encoding="utf-8")
+        self.__receivers: dict[str, Conveyor] = {}
+        self.__pending = 0
+        self.__since_compact = 0
+        self.__timer = None
+
+    def register(self, command: ICommand):
+        # checked when a command is bound, so a bad command fails before it ever runs
+        conveyor = command.receiver
+        if not isinstance(conveyor, Conveyor):
+            raise TypeError(f"{command.__class__.__name__} has no Conveyor receiver to journal")
+        for op in (command.positive_op, command.negative_op):
+            if op not in Conveyor.operations:
+                raise ValueError(f"{command.__class__.__name__} has no journaled operation for {op!r}")
+        if not conveyor.name or conveyor.name.split() != [conveyor.name] or conveyor.name == "snapshot":
+            raise ValueError(f"conveyor name {conveyor.name!r} cannot be journaled")
+        with self.__lock:
+            known = self.__receivers.get(conveyor.name)
+            if known is None:
+                self.__receivers[conveyor.name] = known = conveyor
+                # replay starts from the state the conveyor had when it was first journaled
+                self.__write(f"snapshot {conveyor.name} {int(conveyor.running)} {conveyor.speed}")
+        if known is not conveyor:
+            raise ValueError(f"another conveyor is already journaled as {conveyor.name!r}")
+
+    def append(self, conveyor: Conveyor, op: str):
+        self.__write(f"{conveyor.name} {op}")
+
+    def __write(self, record: str):
+        with self.__lock:
+            self.__file.write(record + "\n")
+            self.__pending += 1
+            self.__since_compact += 1
+            if self.__pending >= self.batch_size:
+                self.sync()
+            elif self.__timer is None:
+                self.__timer = threading.Timer(self.interval, self.sync)
+                self.__timer.daemon = True
+                self.__timer.start()
+            if self.__since_compact >= self.compact_every:
+                self.compact()
+
+    def sync(self):
+        # group commit: one fsync covers every record written since the last one
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            if self.__pending == 0 or self.__file.closed:
+                return
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__pending = 0
+
+    @staticmethod
+    def __parse(raw: bytes):
+        # None for a record a crash left torn or unreadable
+        if not raw.endswith(b"\n"):
+            return None
+        try:
+            fields = raw.decode("utf-8").split()
+        except UnicodeDecodeError:
+            return None
+        if len(fields) == 4 and fields[0] == "snapshot" and fields[2] in ("0", "1"):
+            try:
+                return fields[1], fields[2] == "1", int(fields[3])
+            except ValueError:
+                return None
+        if len(fields) == 2 and fields[0] != "snapshot" and fields[1] in Conveyor.operations:
+            return fields[0], fields[1]
+        return None
+
+    def replay(self, conveyors: dict[str, Conveyor] = None) -> dict[str, Conveyor]:
+        # rebuilds every journaled conveyor; pass existing ones to restore them in place.
+        # the log ends at the first malformed record, which is cut off so new appends stay readable
+        conveyors = {} if conveyors is None else conveyors
+        with self.__lock:
+            self.sync()
+            valid = 0
+            with open(self.path, "rb") as journal:
+                for raw in journal:
+                    record = self.__parse(raw)
+                    if record is None:
+                        break
+                    valid += len(raw)
+                    name, *state = record
+                    conveyor = conveyors.setdefault(name, Conveyor(name))
+                    if len(state) == 1:
+                        conveyor.apply(state[0])
+                    else:
+                        conveyor.running, conveyor.speed = state
+            if valid < os.path.getsize(self.path):
+                os.truncate(self.path, valid)
+        return conveyors
+
+    def compact(self):
+        with self.__lock:
+            states = self.replay()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as snapshot:
+                for name, state in states.items():
+                    snapshot.write(f"snapshot {name} {int(state.running)} {state.speed}\n")
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            self.__file.close()
+            os.replace(tmp, self.path)
+            self.__file = open(self.path, "a", encoding="utf-8")
+            self.__since_compact = 0
+
+    def close(self):
+        with self.__lock:
+            self.sync()
+            self.__file.close()
+
+
 class Multipult:
-    def __init__(self):
+    def __init__(self, capacity: int = 100, compact: bool = False, journal: CommandJournal = None):
         self.__commands: list[ICommand] = [None, None]
-        self.__history: Deque[ICommand] = []
+        # entries are [command, repeat count]; the oldest fall off once capacity is reached
+        self.__history: Deque[list] = deque(maxlen=capacity)
+        self.__redo: Deque[list] = deque(maxlen=capacity)
+        self.__compact = compact
+        self.__journal = journal
 
     def set_command(self, button: int, command: ICommand):
+        if self.__journal is not None:
+            self.__journal.register(command)
         self.__commands[button] = command
 
+    @staticmethod
+    def __push(stack: Deque[list], command: ICommand, compact: bool):
+        if compact and stack and stack[-1][0] is command:
+            stack[-1][1] += 1
+        else:
+            stack.append([command, 1])
+
+    @staticmethod
+    def __pop(stack: Deque[list]) -> ICommand:
+        entry = stack[-1]
+        entry[1] -= 1
+        if entry[1] == 0:
+            stack.pop()
+        return entry[0]
+
+    def __record(self, command: ICommand, op: str):
+        # write-ahead: the record is appended before the command touches its receiver
+        if self.__journal is not None:
+            self.__journal.append(command.receiver, op)
+
     def press_on(self, button: int):
+        self.__record(self.__commands[button], self.__commands[button].positive_op)
         self.__commands[button].positive()
-        self.__history.append(self.__commands[button])
+        self.__push(self.__history, self.__commands[button], self.__compact)
+        self.__redo.clear()
 
     def press_cancel(self):
-        if len(self.__commands) != 0:
-            self.__commands[0].negative()
+        if not self.__history:
+            return
+        command = self.__pop(self.__history)
+        self.__record(command, command.negative_op)
+        command.negative()
+        self.__push(self.__redo, command, self.__compact)
+
+    def press_redo(self):
+        if not self.__redo:
+            return
+        command = self.__pop(self.__redo)
+        self.__record(command, command.positive_op)
+        command.positive()
+        self.__push(self.__history, command, self.__compact)
+
+    def history_size(self) -> int:
+        return len(self.__history)
 
 
 if __name__ == "__main__":
@@ -75,3 +289,26 @@ if __name__ == "__main__":
     multipult.press_on(1)
     multipult.press_cancel()
     multipult.press_cancel()
+    multipult.press_redo()
+
+    compact = Multipult(capacity=10, compact=True)
+    compact.set_command(1, ConveyorAdjustCommand(conveyor))
+    for _ in range(5):
+        compact.press_on(1)
+    print("History entries:", compact.history_size())
+    compact.press_cancel()
+    print("History entries:", compact.history_size())
+
+    journal = CommandJournal("conveyor.journal", compact_every=4)
+    logged = Multipult(journal=journal)
+    logged.set_command(0, ConveyorWorkCommand(conveyor))
+    logged.set_command(1, ConveyorAdjustCommand(Conveyor("packing")))
+    logged.press_on(0)
+    logged.press_on(1)
+    logged.press_on(1)
+    logged.press_cancel()
+    logged.press_on(1)
+    for name, restored in journal.replay().items():
+        print("Restored:", name, restored.running, restored.speed)
+    journal.close()
+    os.remove("conveyor.journal")
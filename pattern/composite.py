@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Iterator
 
 
 class Component(ABC):
@@ -18,18 +20,56 @@ class File(Component):
 class Folder(Component):
     def __init__(self, name: str):
         self.name = name
-        self.files = []
+        self._children: dict[str, Component] = {}
+
+    @property
+    def files(self) -> list[Component]:
+        return list(self._children.values())
 
     def add(self, component: Component):
-        self.files.append(component)
+        if component.name in self._children:
+            raise ValueError(f"{self.name} already contains {component.name}")
+        self._children[component.name] = component
 
     def remove(self, component: Component):
-        self.files.remove(component)
+        if self._children.get(component.name) is not component:
+            raise ValueError(f"{component.name} is not a child of {self.name}")
+        del self._children[component.name]
+
+    def get(self, name: str) -> Component:
+        return self._children[name]
+
+    def walk(
+        self,
+        order: str = "depth",
+        prune: Callable[["Folder"], bool] = None,
+    ) -> Iterator[tuple[int, Component]]:
+        # explicit stack/queue instead of recursion, so depth is not bounded by the recursion limit;
+        # prune(folder) returning True skips that folder's children
+        if order not in ("depth", "breadth"):
+            raise ValueError(f"unknown walk order: {order}")
+        pending = deque([(0, self)])
+        take = pending.pop if order == "depth" else pending.popleft
+        while pending:
+            depth, component = take()
+            yield depth, component
+            if not isinstance(component, Folder) or (prune is not None and prune(component)):
+                continue
+            children = component._children.values()
+            if order == "depth":
+                children = reversed(children)
+            pending.extend((depth + 1, child) for child in children)
 
     def read(self):
-        print(f"{self.name} Folder reading")
-        for file in self.files:
-            file.read()
+        # plain folders are read iteratively; a Folder subclass with its own read() gets its subtree
+        def custom(folder: Folder) -> bool:
+            return folder is not self and type(folder).read is not Folder.read
+
+        for _, component in self.walk(prune=custom):
+            if isinstance(component, Folder) and not custom(component):
+                print(f"{component.name} Folder reading")
+            else:
+                component.read()
 
 
 if __name__ == "__main__":
@@ -47,3 +87,13 @@ if __name__ == "__main__":
     folder.add(folder2)
     folder.read()
     file4 = File("file4.py")
+
+    deep = Folder("root")
+    current = deep
+    for level in range(5000):
+        child = Folder(f"level{level}")
+        current.add(child)
+        current = child
+    print("Nodes:", sum(1 for _ in deep.walk()))
+    print([c.name for _, c in folder.walk(order="breadth")])
+    print([c.name for _, c in deep.walk(prune=lambda f: f.name == "level2")])
@@ -1,3 +1,13 @@
+import heapq
+import sys
+import threading
+import tracemalloc
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+
 class TreeType:
     def __init__(self, name: str, color: str, texture: str):
         self.name = name
@@ -9,15 +19,67 @@ class TreeType:
 
 
 class TreeTypeFactory:
-    _tree_type: dict[str, TreeType] = {}
+    _tree_type: dict[tuple[str, str, str], TreeType] = {}
+    _lock = threading.Lock()
+    _policy: str = None
+    _max_size: int = 0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+    _bytes_saved = 0
+
+    @staticmethod
+    def configure(policy: str = None, max_size: int = 1024):
+        if policy not in (None, "lru", "weakref"):
+            raise ValueError(f"unknown eviction policy: {policy}")
+        with TreeTypeFactory._lock:
+            types = dict(TreeTypeFactory._tree_type)
+            if policy == "weakref":
+                TreeTypeFactory._tree_type = weakref.WeakValueDictionary(types)
+            elif policy == "lru":
+                TreeTypeFactory._tree_type = OrderedDict(types)
+            else:
+                TreeTypeFactory._tree_type = types
+            TreeTypeFactory._policy = policy
+            TreeTypeFactory._max_size = max_size
+            TreeTypeFactory._evict()
+
+    @staticmethod
+    def _evict():
+        if TreeTypeFactory._policy != "lru":
+            return
+        while len(TreeTypeFactory._tree_type) > TreeTypeFactory._max_size:
+            TreeTypeFactory._tree_type.popitem(last=False)
+            TreeTypeFactory._evictions += 1
 
     @staticmethod
     def create(name: str, color: str, texture: str) -> TreeType:
-        if name not in TreeTypeFactory._tree_type:
-            TreeTypeFactory._tree_type[name] = TreeType(name, color, texture)
-            print("create new tree with name", name)
-            return TreeTypeFactory._tree_type[name]
-        return TreeTypeFactory._tree_type[name]
+        key = (name, color, texture)
+        with TreeTypeFactory._lock:
+            tree_type = TreeTypeFactory._tree_type.get(key)
+            if tree_type is not None:
+                TreeTypeFactory._hits += 1
+                TreeTypeFactory._bytes_saved += sys.getsizeof(tree_type) + sys.getsizeof(tree_type.__dict__)
+                if TreeTypeFactory._policy == "lru":
+                    TreeTypeFactory._tree_type.move_to_end(key)
+                return tree_type
+            TreeTypeFactory._misses += 1
+            tree_type = TreeTypeFactory._tree_type[key] = TreeType(name, color, texture)
+            TreeTypeFactory._evict()
+        print("create new tree with name", name)
+        return tree_type
+
+    @staticmethod
+    def stats() -> dict:
+        with TreeTypeFactory._lock:
+            return {
+                "policy": TreeTypeFactory._policy,
+                "hits": TreeTypeFactory._hits,
+                "misses": TreeTypeFactory._misses,
+                "evictions": TreeTypeFactory._evictions,
+                "live_types": len(TreeTypeFactory._tree_type),
+                "bytes_saved": TreeTypeFactory._bytes_saved,
+            }
 
 
 class Tree:
@@ -30,6 +92,178 @@ class Tree:
         return self.tree_type.draw(self.x, self.y)
 
 
+class Forest:
+    def __init__(self):
+        # struct-of-arrays: one contiguous column per field instead of one object per tree
+        self.xs = array("i")
+        self.ys = array("i")
+        self.type_ids = array("H")
+        # type ids index into this forest's own table, so the factory may evict freely
+        self._types: list[TreeType] = []
+        self._type_index: dict[TreeType, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def _type_id(self, tree_type: TreeType) -> int:
+        type_id = self._type_index.get(tree_type)
+        if type_id is None:
+            type_id = self._type_index[tree_type] = len(self._types)
+            self._types.append(tree_type)
+        return type_id
+
+    def add(self, x: int, y: int, tree_type: TreeType) -> int:
+        self.xs.append(x)
+        self.ys.append(y)
+        self.type_ids.append(self._type_id(tree_type))
+        return len(self.xs) - 1
+
+    def add_many(self, xs: Iterable[int], ys: Iterable[int], tree_type: TreeType) -> range:
+        # build the new rows aside so a bad value cannot leave the columns ragged
+        new_xs = array("i", xs)
+        new_ys = array("i", ys)
+        if len(new_xs) != len(new_ys):
+            raise ValueError("xs and ys must have the same length")
+        new_type_ids = array("H", [self._type_id(tree_type)]) * len(new_xs)
+        start = len(self.xs)
+        self.xs.extend(new_xs)
+        self.ys.extend(new_ys)
+        self.type_ids.extend(new_type_ids)
+        return range(start, start + len(new_xs))
+
+    def tree(self, i: int) -> Tree:
+        return Tree(self.xs[i], self.ys[i], self._types[self.type_ids[i]])
+
+    def positions(self) -> Iterator[tuple[int, int, int]]:
+        return zip(range(len(self.xs)), self.xs, self.ys)
+
+    def records(self) -> Iterator[tuple[int, int, TreeType]]:
+        types = self._types
+        for x, y, type_id in zip(self.xs, self.ys, self.type_ids):
+            yield x, y, types[type_id]
+
+    def render(self) -> Iterator[str]:
+        for x, y, tree_type in self.records():
+            yield tree_type.draw(x, y)
+
+
+class GridIndex:
+    def __init__(self, cell_size: int = 64):
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], set] = {}
+        self._points: dict = {}
+        # cell coordinates covering every occupied cell (min cx, min cy, max cx, max cy);
+        # removals don't shrink it, it only has to bound the nearest() search
+        self._bounds: tuple[int, int, int, int] = None
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, x: int, y: int) -> tuple[int, int]:
+        return x // self.cell_size, y // self.cell_size
+
+    def _extend(self, cx: int, cy: int):
+        if self._bounds is None:
+            self._bounds = (cx, cy, cx, cy)
+        else:
+            x0, y0, x1, y1 = self._bounds
+            self._bounds = (min(x0, cx), min(y0, cy), max(x1, cx), max(y1, cy))
+
+    def insert(self, handle, x: int, y: int):
+        if handle in self._points:
+            self.remove(handle)
+        self._points[handle] = (x, y)
+        key = self._cell(x, y)
+        self._cells.setdefault(key, set()).add(handle)
+        self._extend(*key)
+
+    def bulk_load(self, items: Iterable[tuple[object, int, int]]):
+        cells, points, cell_size = self._cells, self._points, self.cell_size
+        for handle, x, y in items:
+            if handle in points:
+                self.remove(handle)
+            points[handle] = (x, y)
+            key = (x // cell_size, y // cell_size)
+            bucket = cells.get(key)
+            if bucket is None:
+                bucket = cells[key] = set()
+                self._extend(*key)
+            bucket.add(handle)
+
+    def remove(self, handle):
+        x, y = self._points.pop(handle)
+        key = self._cell(x, y)
+        bucket = self._cells[key]
+        bucket.discard(handle)
+        if not bucket:
+            del self._cells[key]
+            if not self._cells:
+                self._bounds = None
+
+    def query(self, x0: int, y0: int, x1: int, y1: int) -> list:
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        points, found = self._points, []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = self._cells.get((cx, cy))
+                if not bucket:
+                    continue
+                inside = cx0 < cx < cx1 and cy0 < cy < cy1
+                for handle in bucket:
+                    if inside:
+                        found.append(handle)
+                        continue
+                    x, y = points[handle]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(handle)
+        return found
+
+    def nearest(self, x: int, y: int, k: int = 1) -> list:
+        if k <= 0 or not self._cells:
+            return []
+        k = min(k, len(self._points))
+        cx, cy = self._cell(x, y)
+        x0, y0, x1, y1 = self._bounds
+        max_ring = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+        best: list[tuple[int, int, object]] = []
+        for ring in range(max_ring + 1):
+            # every point in this ring is at least ring - 1 cells away from (x, y)
+            bound = max(ring - 1, 0) * self.cell_size
+            if len(best) == k and -best[0][0] <= bound * bound:
+                break
+            for ax in range(cx - ring, cx + ring + 1):
+                step = 1 if ax in (cx - ring, cx + ring) else 2 * ring
+                for ay in range(cy - ring, cy + ring + 1, step):
+                    for handle in self._cells.get((ax, ay), ()):
+                        px, py = self._points[handle]
+                        dist = (px - x) ** 2 + (py - y) ** 2
+                        if len(best) < k:
+                            heapq.heappush(best, (-dist, id(handle), handle))
+                        elif dist < -best[0][0]:
+                            heapq.heapreplace(best, (-dist, id(handle), handle))
+        return [handle for _, _, handle in sorted(best, reverse=True)]
+
+
+def memory_benchmark(n: int = 100_000) -> dict[str, int]:
+    tree_type = TreeTypeFactory.create("Archa", "Yashil", "Igna bargli")
+
+    tracemalloc.start()
+    trees = [Tree(i, i * 2, tree_type) for i in range(n)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del trees
+
+    tracemalloc.start()
+    forest = Forest()
+    forest.add_many(range(n), range(0, n * 2, 2), tree_type)
+    forest_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del forest
+
+    return {"trees": n, "list[Tree]": list_bytes, "Forest": forest_bytes}
+
+
 if __name__ == "__main__":
     trees: list[Tree] = []
     for i in range(200):
@@ -49,3 +283,19 @@ if __name__ == "__main__":
 
     print("Length of trees:", len(trees))
     print("Length of tree factory:", len(TreeTypeFactory._tree_type))
+    print("Tree factory stats:", TreeTypeFactory.stats())
+
+    forest = Forest()
+    forest.add_many(range(200), range(0, 400, 2), TreeTypeFactory.create("Archa", "Yashil", "Igna bargli"))
+    forest.add(5, 10, TreeTypeFactory.create("Yong'oq", "Kulrang", "Katta bargli"))
+    render = forest.render()
+    print("forest[0]:", next(render))
+    print("forest[200]:", forest.tree(200).display())
+    print("Length of forest:", len(forest))
+    print("Memory benchmark:", memory_benchmark())
+
+    index = GridIndex(cell_size=32)
+    index.bulk_load(forest.positions())
+    visible = index.query(0, 0, 20, 40)
+    print("Visible trees:", len(visible), [forest.tree(i).display() for i in visible[:2]])
+    print("Nearest to 6:11:", [forest.tree(i).display() for i in index.nearest(6, 11, k=2)])
@@ -1,3 +1,8 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import zlib
 from abc import ABC, abstractmethod
 
 
@@ -24,6 +29,265 @@ class ChatRoom(IMediator):
                 u.receive(msg, sender)
 
 
+class AsyncChatRoom(IMediator):
+    policies = ("block", "drop_oldest", "disconnect")
+
+    def __init__(self, mailbox_size: int = 100, policy: str = "drop_oldest"):
+        if policy not in self.policies:
+            raise ValueError(f"unknown backpressure policy: {policy}")
+        self.mailbox_size = mailbox_size
+        self.policy = policy
+        self.mailboxes: dict["IUser", asyncio.Queue] = {}
+        self.consumers: dict["IUser", asyncio.Task] = {}
+        # blocked senders queue up on this lock, so a full mailbox is filled in send order
+        self.put_locks: dict["IUser", asyncio.Lock] = {}
+        self.started = time.perf_counter()
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def add_user(self, user: "IUser"):
+        mailbox = asyncio.Queue(self.mailbox_size)
+        self.mailboxes[user] = mailbox
+        self.put_locks[user] = asyncio.Lock()
+        self.consumers[user] = asyncio.get_running_loop().create_task(self.__consume(user, mailbox))
+
+    def remove_user(self, user: "IUser"):
+        mailbox = self.mailboxes.pop(user, None)
+        self.put_locks.pop(user, None)
+        consumer = self.consumers.pop(user, None)
+        if consumer is not None:
+            consumer.cancel()
+        if mailbox is not None:
+            # undelivered messages are dropped and marked done, so mailbox.join() can finish
+            while not mailbox.empty():
+                mailbox.get_nowait()
+                mailbox.task_done()
+                self.dropped += 1
+
+    async def __consume(self, user: "IUser", mailbox: asyncio.Queue):
+        while True:
+            msg, sender, sent_at = await mailbox.get()
+            try:
+                result = user.receive(msg, sender)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                # a failing receive must not stop the mailbox from draining
+                self.failed += 1
+            finally:
+                latency = time.perf_counter() - sent_at
+                self.delivered += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                mailbox.task_done()
+
+    def __offer(self, user: "IUser", mailbox: asyncio.Queue, item: tuple) -> bool:
+        # returns False only when the "block" policy has to wait for a free slot
+        if self.put_locks[user].locked():
+            return False
+        try:
+            mailbox.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.policy == "drop_oldest":
+                mailbox.get_nowait()
+                mailbox.task_done()
+                mailbox.put_nowait(item)
+                self.dropped += 1
+            elif self.policy == "disconnect":
+                self.remove_user(user)
+                self.disconnected += 1
+            else:
+                return False
+        return True
+
+    def send_message(self, msg: str, sender: "IUser"):
+        # enqueue only: the sender never waits for recipients to process the message
+        if self.policy == "block":
+            raise RuntimeError('the "block" policy can only be used through await broadcast(...)')
+        item = (msg, sender, time.perf_counter())
+        self.sent += 1
+        for u, mailbox in list(self.mailboxes.items()):
+            if u is not sender:
+                self.__offer(u, mailbox, item)
+
+    async def broadcast(self, msg: str, sender: "IUser"):
+        # like send_message, but with the "block" policy the sender awaits free mailbox slots
+        item = (msg, sender, time.perf_counter())
+        self.sent += 1
+        for u, mailbox in list(self.mailboxes.items()):
+            if u is sender or u not in self.mailboxes or self.__offer(u, mailbox, item):
+                continue
+            async with self.put_locks[u]:
+                consumer = self.consumers.get(u)
+                if consumer is None:
+                    continue
+                put = asyncio.ensure_future(mailbox.put(item))
+                # stop waiting if the user leaves while we are blocked on their mailbox
+                await asyncio.wait({put, consumer}, return_when=asyncio.FIRST_COMPLETED)
+                if not put.done():
+                    put.cancel()
+
+    async def join(self):
+        await asyncio.gather(*(
+            self.__join_mailbox(self.mailboxes[user], consumer) for user, consumer in list(self.consumers.items())
+        ))
+
+    @staticmethod
+    async def __join_mailbox(mailbox: asyncio.Queue, consumer: asyncio.Task):
+        # a user removed while we wait has no consumer left, so stop waiting on their mailbox
+        joined = asyncio.ensure_future(mailbox.join())
+        await asyncio.wait({joined, consumer}, return_when=asyncio.FIRST_COMPLETED)
+        if not joined.done():
+            joined.cancel()
+
+    def close(self):
+        for user in list(self.consumers):
+            self.remove_user(user)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "users": len(self.mailboxes),
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+            "queue_depth": sum(mailbox.qsize() for mailbox in self.mailboxes.values()),
+            "throughput": self.delivered / elapsed if elapsed else 0.0,
+            "latency_avg": self.latency_total / self.delivered if self.delivered else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+
+def _shard_worker(inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+    # a shard resolves recipients for its users; delivery happens in the parent
+    topics: dict[str, set[int]] = {}
+    routed = 0
+    while True:
+        command, *args = inbox.get()
+        if command == "msg":
+            topic, msg, sender_id = args
+            recipients = [uid for uid in topics.get(topic, ()) if uid != sender_id]
+            if recipients:
+                outbox.put(("deliver", recipients, msg, sender_id))
+                routed += len(recipients)
+        elif command == "join":
+            topic, uid = args
+            topics.setdefault(topic, set()).add(uid)
+        elif command == "leave":
+            topic, uid = args
+            topics.get(topic, set()).discard(uid)
+        elif command == "stop":
+            outbox.put(("stats", {"routed": routed, "users": len(set().union(*topics.values()))}))
+            return
+
+
+class ShardedChatRoom(IMediator):
+    def __init__(self, shards: int = 2):
+        self.inboxes = [multiprocessing.Queue() for _ in range(shards)]
+        self.outbox = multiprocessing.Queue()
+        self.workers = [
+            multiprocessing.Process(target=_shard_worker, args=(inbox, self.outbox), daemon=True)
+            for inbox in self.inboxes
+        ]
+        # users are keyed by a unique id, so equal names never collide
+        self.ids: dict["IUser", int] = {}
+        self.users: dict[int, "IUser"] = {}
+        self.next_id = 0
+        # topic -> {shard: subscriber count}, so a message only travels to shards that need it
+        self.routes: dict[str, dict[int, int]] = {}
+        self.user_topics: dict[int, set[str]] = {}
+        self.shard_stats: list[dict] = []
+        self.delivered = 0
+        self.failed = 0
+        self.stopped = threading.Event()
+        for worker in self.workers:
+            worker.start()
+        self.dispatcher = threading.Thread(target=self.__dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def __dispatch(self):
+        # runs in the parent: hands routed messages to the registered IUser objects
+        try:
+            while len(self.shard_stats) < len(self.workers):
+                kind, *args = self.outbox.get()
+                if kind == "stats":
+                    self.shard_stats.append(args[0])
+                    continue
+                recipients, msg, sender_id = args
+                sender = self.users.get(sender_id)
+                for uid in recipients:
+                    user = self.users.get(uid)
+                    if user is None:
+                        continue
+                    try:
+                        user.receive(msg, sender)
+                        self.delivered += 1
+                    except Exception:
+                        # one failing receiver must not cost the others their copy
+                        self.failed += 1
+        finally:
+            # close() waits on this, so it is set even if the loop itself dies
+            self.stopped.set()
+
+    def user_id(self, user: "IUser") -> int:
+        uid = self.ids.get(user)
+        if uid is None:
+            uid = self.ids[user] = self.next_id
+            self.users[uid] = user
+            self.next_id += 1
+        return uid
+
+    def shard_of(self, uid: int) -> int:
+        return zlib.crc32(uid.to_bytes(8, "little")) % len(self.inboxes)
+
+    def add_user(self, user: "IUser", topic: str = "general"):
+        uid = self.user_id(user)
+        topics = self.user_topics.setdefault(uid, set())
+        if topic in topics:
+            return
+        topics.add(topic)
+        shard = self.shard_of(uid)
+        shards = self.routes.setdefault(topic, {})
+        shards[shard] = shards.get(shard, 0) + 1
+        self.inboxes[shard].put(("join", topic, uid))
+
+    def remove_user(self, user: "IUser", topic: str = "general"):
+        uid = self.ids.get(user)
+        topics = self.user_topics.get(uid, set())
+        if topic not in topics:
+            return
+        topics.discard(topic)
+        shard = self.shard_of(uid)
+        shards = self.routes[topic]
+        shards[shard] -= 1
+        if not shards[shard]:
+            del shards[shard]
+        self.inboxes[shard].put(("leave", topic, uid))
+
+    def send_message(self, msg: str, sender: "IUser", topic: str = None):
+        uid = self.user_id(sender)
+        topics = [topic] if topic is not None else self.user_topics.get(uid, ())
+        for t in topics:
+            for shard in self.routes.get(t, ()):
+                self.inboxes[shard].put(("msg", t, msg, uid))
+
+    def close(self) -> list[dict]:
+        # every shard answers "stop" after the messages queued before it, so all deliveries are done
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+        self.stopped.wait()
+        for worker in self.workers:
+            worker.join()
+        return self.shard_stats
+
+
 class IUser(ABC):
     def __init__(self, mediator: IMediator, name: str):
         self.mediator = mediator
@@ -60,3 +324,27 @@ if __name__ == "__main__":
 
     alice.send("Привет всем!")
     bob.send("Привет, Alice!")
+
+    async def main():
+        async_chat = AsyncChatRoom(mailbox_size=2, policy="drop_oldest")
+        users = [ChatUser(async_chat, name) for name in ("Dave", "Eve", "Frank")]
+        for user in users:
+            async_chat.add_user(user)
+        for i in range(4):
+            users[0].send(f"Сообщение {i}")
+        await async_chat.join()
+        print(async_chat.stats())
+        async_chat.close()
+
+    asyncio.run(main())
+
+    sharded = ShardedChatRoom(shards=2)
+    members = [ChatUser(sharded, name) for name in ("Gulnora", "Hasan", "Ivan", "Ivan")]
+    for member in members:
+        sharded.add_user(member, "news")
+    sharded.add_user(members[1], "sport")
+    members[0].send("Новости дня")
+    sharded.send_message("Счёт 2:1", members[1], "sport")
+    sharded.remove_user(members[3], "news")
+    members[2].send("Второй Ivan уже ушёл")
+    print(sharded.close())
@@ -1,8 +1,13 @@
+import mmap
+import os
+import struct
 from abc import ABC, abstractmethod
-from typing import Deque
+from array import array
 
 
 class IMemento(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def get_dollars(self) -> int:
         pass
@@ -13,6 +18,8 @@ class IMemento(ABC):
 
 
 class ExchangeMemento(IMemento):
+    __slots__ = ("__dollars", "__euro")
+
     def __init__(self, d: int, e: int):
         self.__dollars = d
         self.__euro = e
@@ -50,13 +57,193 @@ class Exchange:
         self.__euro = exchange_memento.get_euro()
 
 
+class MementoHistory:
+    # ring buffer of (dollars, euro) snapshots: deltas against the previous snapshot are
+    # packed into a 16-bit array, with a full checkpoint every checkpoint_every entries
+    # or whenever a delta does not fit
+    __delta_min = -(1 << 15)
+    __delta_max = (1 << 15) - 1
+
+    def __init__(self, capacity: int = 1000, checkpoint_every: int = 32):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        if checkpoint_every < 1:
+            raise ValueError(f"checkpoint_every must be at least 1, got {checkpoint_every}")
+        self.capacity = capacity
+        self.checkpoint_every = checkpoint_every
+        self.__deltas = array("h", bytes(4 * capacity))
+        self.__full = array("b", bytes(capacity))
+        self.__checkpoints: dict[int, tuple[int, int]] = {}
+        self.__head = 0
+        self.__size = 0
+        self.__top: tuple[int, int] = None
+        self.__since_checkpoint = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __slot(self, n: int) -> int:
+        return (self.__head + n) % self.capacity
+
+    def __record(self, n: int) -> tuple[int, int]:
+        slot = self.__slot(n)
+        if self.__full[slot]:
+            return self.__checkpoints[slot]
+        return self.__deltas[2 * slot], self.__deltas[2 * slot + 1]
+
+    def __write(self, n: int, d: int, e: int, full: bool):
+        slot = self.__slot(n)
+        self.__full[slot] = full
+        if full:
+            self.__checkpoints[slot] = (d, e)
+        else:
+            self.__checkpoints.pop(slot, None)
+            self.__deltas[2 * slot] = d
+            self.__deltas[2 * slot + 1] = e
+
+    def __fits(self, dd: int, de: int) -> bool:
+        return self.__delta_min <= dd <= self.__delta_max and self.__delta_min <= de <= self.__delta_max
+
+    def __checkpoint_before(self, n: int) -> int:
+        while not self.__full[self.__slot(n)]:
+            n -= 1
+        return n
+
+    def get(self, n: int) -> ExchangeMemento:
+        if not 0 <= n < self.__size:
+            raise IndexError(n)
+        start = self.__checkpoint_before(n)
+        d, e = self.__record(start)
+        for i in range(start + 1, n + 1):
+            dd, de = self.__record(i)
+            d, e = d + dd, e + de
+        return ExchangeMemento(d, e)
+
+    def push(self, memento: IMemento):
+        d, e = memento.get_dollars(), memento.get_euro()
+        if self.__size == self.capacity:
+            self.__evict_oldest()
+        if self.__top is not None and self.__since_checkpoint < self.checkpoint_every:
+            dd, de = d - self.__top[0], e - self.__top[1]
+            if self.__fits(dd, de):
+                self.__write(self.__size, dd, de, False)
+                self.__since_checkpoint += 1
+                self.__size += 1
+                self.__top = (d, e)
+                return
+        self.__write(self.__size, d, e, True)
+        self.__since_checkpoint = 0
+        self.__size += 1
+        self.__top = (d, e)
+
+    def pop(self) -> ExchangeMemento:
+        if self.__size == 0:
+            raise IndexError("pop from empty history")
+        d, e = self.__top
+        last = self.__size - 1
+        full = self.__full[self.__slot(last)]
+        dd, de = self.__record(last)
+        if full:
+            del self.__checkpoints[self.__slot(last)]
+        self.__size -= 1
+        if self.__size == 0:
+            self.__top = None
+            self.__since_checkpoint = 0
+        elif not full:
+            self.__top = (d - dd, e - de)
+            self.__since_checkpoint -= 1
+        else:
+            previous = self.get(self.__size - 1)
+            self.__top = (previous.get_dollars(), previous.get_euro())
+            self.__since_checkpoint = self.__size - 1 - self.__checkpoint_before(self.__size - 1)
+        return ExchangeMemento(d, e)
+
+    def __evict_oldest(self):
+        # the oldest record is always a checkpoint; fold it into its successor
+        if self.__size > 1 and not self.__full[self.__slot(1)]:
+            d, e = self.__record(0)
+            dd, de = self.__record(1)
+            self.__write(1, d + dd, e + de, True)
+            if self.__checkpoint_before(self.__size - 1) == 1:
+                self.__since_checkpoint = self.__size - 2
+        del self.__checkpoints[self.__head]
+        self.__head = self.__slot(1)
+        self.__size -= 1
+        if self.__size == 0:
+            # the next push must start a fresh checkpoint
+            self.__top = None
+            self.__since_checkpoint = 0
+
+
+class MmapMementoStore:
+    # file layout: 8-byte record count, then fixed 16-byte (dollars, euro) records
+    __header = struct.Struct("<q")
+    __record = struct.Struct("<qq")
+
+    def __init__(self, path: str, initial_capacity: int = 1024):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= self.__header.size
+        self.__file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.__file.truncate(self.__header.size + initial_capacity * self.__record.size)
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        self.__capacity = (len(self.__map) - self.__header.size) // self.__record.size
+        self.__size = self.__header.unpack_from(self.__map, 0)[0]
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __offset(self, n: int) -> int:
+        return self.__header.size + n * self.__record.size
+
+    def __grow(self):
+        self.__map.close()
+        self.__capacity = max(1, self.__capacity * 2)
+        self.__file.truncate(self.__offset(self.__capacity))
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+
+    def push(self, memento: IMemento):
+        if self.__size == self.__capacity:
+            self.__grow()
+        self.__record.pack_into(self.__map, self.__offset(self.__size), memento.get_dollars(), memento.get_euro())
+        self.__size += 1
+        self.__header.pack_into(self.__map, 0, self.__size)
+
+    def get(self, n: int) -> ExchangeMemento:
+        if not 0 <= n < self.__size:
+            raise IndexError(n)
+        return ExchangeMemento(*self.__record.unpack_from(self.__map, self.__offset(n)))
+
+    def pop(self) -> ExchangeMemento:
+        if self.__size == 0:
+            raise IndexError("pop from empty history")
+        memento = self.get(self.__size - 1)
+        self.__size -= 1
+        self.__header.pack_into(self.__map, 0, self.__size)
+        return memento
+
+    def flush(self):
+        self.__map.flush()
+
+    def close(self):
+        self.__map.flush()
+        self.__map.close()
+        self.__file.close()
+
+
 class Memory:
-    def __init__(self, exchange: Exchange):
+    def __init__(
+        self,
+        exchange: Exchange,
+        capacity: int = 1000,
+        checkpoint_every: int = 32,
+        store: MmapMementoStore = None,
+    ):
         self.__exchange = exchange
-        self.__history: Deque[IMemento] = []
+        self.__history = store if store is not None else MementoHistory(capacity, checkpoint_every)
 
     def backup(self):
-        self.__history.append(self.__exchange.save())
+        self.__history.push(self.__exchange.save())
 
     def undo(self):
         if len(self.__history) == 0:
@@ -90,3 +277,14 @@ if __name__ == '__main__':
     memory.undo()
     exchange.get_dollars()
     exchange.get_euro()
+
+    store = MmapMementoStore("exchange.history", initial_capacity=2)
+    disk_memory = Memory(exchange, store=store)
+    for _ in range(5):
+        disk_memory.backup()
+        exchange.sell()
+    print('Снимков на диске:', len(store), 'снимок 2:', store.get(2).get_dollars())
+    disk_memory.undo()
+    exchange.get_dollars()
+    store.close()
+    os.remove("exchange.history")
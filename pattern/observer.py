@@ -1,4 +1,10 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
 
 
 class IObserver(ABC):
@@ -21,30 +27,202 @@ class IObservable(ABC):
         pass
 
 
+class NotificationDispatcher(ABC):
+    # one mailbox slot per observer: a newer price overwrites an undelivered one
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mailboxes: dict[IObserver, tuple[int, float]] = {}
+        self._running: set[IObserver] = set()
+        self._delivered = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def deliver(self, o: IObserver, price: int):
+        with self._lock:
+            if o in self._mailboxes:
+                self._coalesced += 1
+            self._mailboxes[o] = (price, time.perf_counter())
+            if o in self._running:
+                return
+            self._running.add(o)
+        try:
+            self._schedule(o)
+        except Exception:
+            # nothing will drain this mailbox, so don't leave the observer marked as running
+            with self._lock:
+                self._running.discard(o)
+                self._mailboxes.pop(o, None)
+            raise
+
+    def _take(self, o: IObserver):
+        with self._lock:
+            item = self._mailboxes.pop(o, None)
+            if item is None:
+                self._running.discard(o)
+            return item
+
+    def _record(self, enqueued: float, failed: bool = False):
+        latency = time.perf_counter() - enqueued
+        with self._lock:
+            self._delivered += 1
+            self._failed += failed
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    @abstractmethod
+    def _schedule(self, o: IObserver):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": len(self._mailboxes),
+                "delivered": self._delivered,
+                "failed": self._failed,
+                "coalesced": self._coalesced,
+                "latency_avg": self._latency_total / self._delivered if self._delivered else 0.0,
+                "latency_max": self._latency_max,
+            }
+
+
+class ThreadPoolDispatcher(NotificationDispatcher):
+    def __init__(self, max_workers: int = 4):
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _schedule(self, o: IObserver):
+        self._executor.submit(self._drain, o)
+
+    def _drain(self, o: IObserver):
+        while (item := self._take(o)) is not None:
+            price, enqueued = item
+            # a failing observer must not stop its own mailbox from draining
+            try:
+                o.update(price)
+            except Exception:
+                self._record(enqueued, failed=True)
+            else:
+                self._record(enqueued)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class AsyncDispatcher(NotificationDispatcher):
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        super().__init__()
+        # the loop is bound up front so deliver() also works from non-loop threads, e.g. a price feed
+        self._loop = loop or asyncio.get_running_loop()
+        self._tasks: set[asyncio.Task] = set()
+
+    def _schedule(self, o: IObserver):
+        self._loop.call_soon_threadsafe(self._start, o)
+
+    def _start(self, o: IObserver):
+        task = self._loop.create_task(self._drain(o))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, o: IObserver):
+        while (item := self._take(o)) is not None:
+            price, enqueued = item
+            try:
+                result = o.update(price)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                self._record(enqueued, failed=True)
+            else:
+                self._record(enqueued)
+
+    async def join(self):
+        while self._tasks or self._running:
+            await asyncio.gather(*self._tasks)
+            await asyncio.sleep(0)
+
+
 class Product(IObservable):
-    def __init__(self, price: int):
+    def __init__(self, price: int, dispatcher: NotificationDispatcher = None):
         self.__price = price
+        self.__dispatcher = dispatcher
+        self.__notified_price = price
         self.__iobservers: list[IObserver] = []
+        # threshold observers are kept sorted as (threshold, seq, observer)
+        self.__below: list[tuple[int, int, IObserver]] = []
+        self.__above: list[tuple[int, int, IObserver]] = []
+        self.__registrations: dict[IObserver, tuple] = {}
+        self.__seq = count()
+        # dispatcher threads may unsubscribe observers while the caller notifies
+        self.__lock = threading.RLock()
 
     def change_price(self, price: int):
         self.__price = price
         self.notify()
 
-    def add_observer(self, o: IObserver):
-        self.__iobservers.append(o)
+    def add_observer(self, o: IObserver, below: int = None, above: int = None):
+        if below is not None and above is not None:
+            raise ValueError("an observer watches either below or above a threshold")
+        with self.__lock:
+            if o in self.__registrations:
+                return
+            if below is not None:
+                entry = (below, next(self.__seq), o)
+                insort(self.__below, entry)
+                self.__registrations[o] = (self.__below, entry)
+            elif above is not None:
+                entry = (above, next(self.__seq), o)
+                insort(self.__above, entry)
+                self.__registrations[o] = (self.__above, entry)
+            else:
+                self.__iobservers.append(o)
+                self.__registrations[o] = (self.__iobservers, o)
+                return
+            price = self.__notified_price
+        # later changes only visit crossed thresholds, so a condition that already holds fires now
+        if (below is not None and price < below) or (above is not None and price > above):
+            self.__send(o, price)
+
+    def __send(self, o: IObserver, price: int):
+        if self.__dispatcher is None:
+            o.update(price)
+        else:
+            self.__dispatcher.deliver(o, price)
 
     def remove_observer(self, o: IObserver):
-        self.__iobservers.remove(o)
+        with self.__lock:
+            container, entry = self.__registrations.pop(o)
+            if container is self.__iobservers:
+                container.remove(o)
+            else:
+                del container[bisect_left(container, entry)]
 
     def notify(self):
-        for o in self.__iobservers:
-            o.update(self.__price)
+        with self.__lock:
+            old, new = self.__notified_price, self.__price
+            self.__notified_price = new
+            # slices are copies, so observers may unsubscribe while being notified
+            targets = list(self.__iobservers)
+            if new < old:
+                below = self.__below
+                lo = bisect_right(below, (new, float("inf")))
+                hi = bisect_right(below, (old, float("inf")))
+                targets += [o for _, _, o in below[lo:hi]]
+            elif new > old:
+                above = self.__above
+                lo = bisect_left(above, (old, -1))
+                hi = bisect_left(above, (new, -1))
+                targets += [o for _, _, o in above[lo:hi]]
+        for o in targets:
+            if o in self.__registrations:
+                self.__send(o, new)
 
 
 class Wholesale(IObserver):
     def __init__(self, obj: IObservable):
         self.__product = obj
-        obj.add_observer(self)
+        obj.add_observer(self, below=300)
 
     def update(self, i: int):
         if i < 300:
@@ -55,7 +233,7 @@ class Wholesale(IObserver):
 class Buyer(IObserver):
     def __init__(self, obj: IObservable):
         self.product = obj
-        obj.add_observer(self)
+        obj.add_observer(self, below=350)
 
     def update(self, i: int):
         if i < 350:
@@ -68,4 +246,33 @@ if __name__ == "__main__":
     wholesale = Wholesale(product)
     buyer = Buyer(product)
     product.change_price(320)
-    product.change_price(280)
\ No newline at end of file
+    product.change_price(280)
+
+    class Ticker(IObserver):
+        def __init__(self, name: str, delay: float):
+            self.name = name
+            self.delay = delay
+
+        def update(self, i: int):
+            time.sleep(self.delay)
+            print("{} получил цену {}".format(self.name, i))
+
+    dispatcher = ThreadPoolDispatcher()
+    feed = Product(100, dispatcher)
+    feed.add_observer(Ticker("Быстрый", 0))
+    feed.add_observer(Ticker("Медленный", 0.1))
+    for price in range(101, 111):
+        feed.change_price(price)
+    dispatcher.shutdown()
+    print(dispatcher.stats())
+
+    async def main():
+        async_dispatcher = AsyncDispatcher()
+        async_feed = Product(100, async_dispatcher)
+        async_feed.add_observer(Ticker("Асинхронный", 0))
+        for price in range(101, 106):
+            async_feed.change_price(price)
+        await async_dispatcher.join()
+        print(async_dispatcher.stats())
+
+    asyncio.run(main())
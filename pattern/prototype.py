@@ -1,14 +1,19 @@
 import copy
+from array import array
+from types import MappingProxyType
 
 
 class Sheep:
     __name: str = ''
     __params: dict = {'Вес': 20, 'Рост': 34}
+    __owns_params: bool = False
 
     def __init__(self, donor: 'Sheep' = None):
         if donor is not None:
+            # copy-on-write: share the donor's params until one side mutates them
             self.__name = donor.get_name()
-            self.__params = copy.deepcopy(donor.get_params())
+            self.__params = donor.__params
+            donor.__owns_params = False
 
     def set_name(self, name: str):
         self.__name = name
@@ -16,16 +21,71 @@ class Sheep:
     def get_name(self) -> str:
         return self.__name
 
-    def get_params(self) -> dict:
-        return self.__params
+    def get_params(self) -> MappingProxyType:
+        return MappingProxyType(self.__params)
 
     def set_weight(self, new_weight: int):
+        if not self.__owns_params:
+            self.__params = copy.deepcopy(self.__params)
+            self.__owns_params = True
         self.__params['weight'] = new_weight
 
     def clone(self):
         return Sheep(self)
 
 
+class PrototypeRegistry:
+    # clones are copy-on-write and O(1), so they are made on demand from the current prototype
+    def __init__(self):
+        self.__prototypes: dict[str, Sheep] = {}
+
+    def register(self, name: str, prototype: Sheep):
+        self.__prototypes[name] = prototype
+
+    def unregister(self, name: str):
+        del self.__prototypes[name]
+
+    def clone(self, name: str) -> Sheep:
+        return self.__prototypes[name].clone()
+
+    def clone_many(self, name: str, n: int) -> list[Sheep]:
+        prototype = self.__prototypes[name]
+        return [Sheep(prototype) for _ in range(n)]
+
+
+class SheepRecord:
+    __slots__ = ("name", "weight", "params")
+
+    def __init__(self, name: str, weight: int, params: MappingProxyType):
+        self.name = name
+        self.weight = weight
+        self.params = params
+
+
+class Flock:
+    # struct-of-arrays: per-sheep columns plus one params mapping shared by the whole flock
+    def __init__(self, prototype: Sheep, n: int, names: list[str] = None, weights=None):
+        if (names is not None and len(names) != n) or (weights is not None and len(weights) != n):
+            raise ValueError("override columns must have one value per sheep")
+        # sharing through a clone puts the prototype in copy-on-write mode as well
+        self.params = prototype.clone().get_params()
+        self.names = list(names) if names is not None else [prototype.get_name()] * n
+        if weights is not None:
+            self.weights = array("q", weights)
+        else:
+            self.weights = array("q", [self.params.get('weight', self.params['Вес'])]) * n
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> SheepRecord:
+        return SheepRecord(self.names[i], self.weights[i], self.params)
+
+    def records(self) -> list[SheepRecord]:
+        params = self.params
+        return [SheepRecord(name, weight, params) for name, weight in zip(self.names, self.weights)]
+
+
 if __name__ == '__main__':
     sheep_donor: Sheep = Sheep()
     sheep_donor.set_name("ЕЕЕЕ")
@@ -36,4 +96,17 @@ if __name__ == '__main__':
     print(sheep_clone.get_name())
     sheep_donor.set_name("WWWW")
     print(sheep_donor.get_name())
-    print(sheep_clone.get_name())
\ No newline at end of file
+    print(sheep_clone.get_name())
+
+    sheep_clone.set_weight(25)
+    print(dict(sheep_donor.get_params()))
+    print(dict(sheep_clone.get_params()))
+    print(dict(Sheep().get_params()))
+
+    registry = PrototypeRegistry()
+    registry.register("Долли", sheep_donor)
+    flock = registry.clone_many("Долли", 150)
+    print(len(flock), flock[0].get_name(), flock[-1].get_name())
+
+    big_flock = Flock(sheep_donor, 3, names=["Белла", "Долли", "Шон"], weights=[21, 22, 23])
+    print(len(big_flock), big_flock[1].name, big_flock[1].weight, dict(big_flock[1].params))
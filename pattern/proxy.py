@@ -1,31 +1,280 @@
+import asyncio
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
 
 class CurrencyService:
+    _table: dict[str, int] = {
+        "USD/UZS": 12020,
+        "EUR/UZS": 14010,
+        "RUB/UZS": 148,
+        "GBP/UZS": 16150,
+        "KZT/UZS": 24,
+    }
+
     def rate(self) -> int:
         print("Currency Service started")
         time.sleep(2)
-        return 12020
+        return self._table["USD/UZS"]
+
+    def rates(self, pairs: list[str]) -> dict[str, int]:
+        print("Currency Service started for", len(pairs), "pairs")
+        time.sleep(2)
+        return {pair: self._table[pair] for pair in pairs if pair in self._table}
+
+
+class SqliteRateStore:
+    def __init__(self, path: str = "rates.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rates (pair TEXT PRIMARY KEY, rate INTEGER, update_time REAL)"
+            )
+
+    def load(self, pair: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rate, update_time FROM rates WHERE pair = ?", (pair,)
+            ).fetchone()
+
+    def load_all(self, limit: int) -> list[tuple[str, int, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT pair, rate, update_time FROM rates ORDER BY update_time DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def save_many(self, rows: list[tuple[str, int, float]]):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO rates VALUES (?, ?, ?)", rows)
+
+    def save(self, pair: str, rate: int, update_time: float):
+        self.save_many([(pair, rate, update_time)])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
 
 class CurrencyProxy:
     _currency_service = CurrencyService()
     _rates = None
     _update_time = None
+    _pair = "USD/UZS"
+
+    def __init__(self, ttl: float = 60.0, store: SqliteRateStore = None):
+        self.ttl = ttl
+        self._store = store
+        self._lock = threading.Lock()
+        self._refreshing = False
+        if store is not None:
+            # warm start: serve the persisted rate, rate() revalidates it if it's stale
+            row = store.load(self._pair)
+            if row is not None:
+                self._rates, self._update_time = row
+
+    def _is_fresh(self) -> bool:
+        return self._update_time is not None and time.time() - self._update_time < self.ttl
+
+    def _load(self):
+        rates = self._currency_service.rate()
+        self._rates, self._update_time = rates, time.time()
+        if self._store is not None:
+            self._store.save(self._pair, self._rates, self._update_time)
+
+    def _refresh(self):
+        try:
+            self._load()
+        finally:
+            self._refreshing = False
+
+    def _revalidate(self):
+        with self._lock:
+            if self._refreshing or self._is_fresh():
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
 
     def rate(self) -> int:
         if self._rates is None:
-            print("Currency Service is None")
-            self._rates = self._currency_service.rate()
-            self._update_time = time.time()
-        else:
+            # single-flight: only the first caller hits the service, the rest wait for its result
+            with self._lock:
+                if self._rates is None:
+                    print("Currency Service is None")
+                    self._load()
+        elif self._is_fresh():
             print("Currency Service get from cache")
+        else:
+            # stale-while-revalidate: serve the old rate while one background refresh runs
+            print("Currency Service stale, revalidating")
+            self._revalidate()
         print(self._rates, self._update_time)
         return self._rates
 
+    async def arate(self) -> int:
+        if self._rates is not None:
+            return self.rate()
+        return await asyncio.to_thread(self.rate)
+
+
+class LRUCache:
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        if key not in self._data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class KeyedCurrencyProxy:
+    _currency_service = CurrencyService()
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        capacity: int = 256,
+        batch_window: float = 0.05,
+        store: SqliteRateStore = None,
+    ):
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self._cache = LRUCache(capacity)
+        self._store = store
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        # pairs whose batch is already at the service, kept until that batch resolves
+        self._inflight: dict[str, Future] = {}
+        self._timer = None
+        self._store_errors = 0
+        if store is not None:
+            for pair, value, update_time in reversed(store.load_all(capacity)):
+                self._cache.put(pair, (value, update_time))
+
+    def _schedule(self, pair: str) -> Future:
+        # misses arriving within batch_window are merged into one rates([...]) call,
+        # and a pair that is already being fetched joins that fetch
+        fut = self._pending.get(pair) or self._inflight.get(pair)
+        if fut is None:
+            fut = self._pending[pair] = Future()
+            if self._timer is None:
+                self._timer = threading.Timer(self.batch_window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return fut
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending, self._timer = self._pending, {}, None
+            self._inflight.update(batch)
+        try:
+            rates = self._currency_service.rates(list(batch))
+        except Exception as e:
+            with self._lock:
+                for pair in batch:
+                    del self._inflight[pair]
+            for fut in batch.values():
+                fut.set_exception(e)
+            return
+        now = time.time()
+        with self._lock:
+            for pair, value in rates.items():
+                self._cache.put(pair, (value, now))
+            for pair in batch:
+                del self._inflight[pair]
+        for pair, fut in batch.items():
+            if pair in rates:
+                fut.set_result(rates[pair])
+            else:
+                fut.set_exception(KeyError(pair))
+        if self._store is not None:
+            # readers are already answered; a persistence failure only costs the warm start
+            try:
+                self._store.save_many([(pair, value, now) for pair, value in rates.items()])
+            except Exception:
+                with self._lock:
+                    self._store_errors += 1
+
+    def _lookup(self, pair: str):
+        entry = self._cache.get(pair)
+        if entry is None:
+            return None, self._schedule(pair)
+        value, update_time = entry
+        if time.time() - update_time >= self.ttl:
+            self._schedule(pair)
+        return value, None
+
+    def rate(self, pair: str) -> int:
+        with self._lock:
+            value, fut = self._lookup(pair)
+        return value if fut is None else fut.result()
+
+    def rates(self, pairs: list[str]) -> dict[str, int]:
+        with self._lock:
+            found = {pair: self._lookup(pair) for pair in pairs}
+        return {pair: value if fut is None else fut.result() for pair, (value, fut) in found.items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._cache.stats(), "store_errors": self._store_errors}
+
+
 if __name__ == "__main__":
-    proxy = CurrencyProxy()
+    proxy = CurrencyProxy(ttl=3)
+    threads = [threading.Thread(target=proxy.rate) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(proxy.rate())
+    time.sleep(3)
     print(proxy.rate())
     print(proxy.rate())
+    time.sleep(2.5)
     print(proxy.rate())
-    print(proxy.rate())
\ No newline at end of file
+
+    keyed = KeyedCurrencyProxy(ttl=60, capacity=3)
+    pairs = ["USD/UZS", "EUR/UZS", "RUB/UZS", "GBP/UZS"]
+    threads = [threading.Thread(target=keyed.rate, args=(pair,)) for pair in pairs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(keyed.rates(["GBP/UZS", "RUB/UZS", "EUR/UZS"]))
+    print(keyed.stats())
+
+    store = SqliteRateStore(":memory:")
+    KeyedCurrencyProxy(store=store).rates(pairs)
+    warm = KeyedCurrencyProxy(store=store)
+    print(warm.rates(pairs))
+    print(warm.stats())
+    store.close()
@@ -1,18 +1,256 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = 5, timeout: float = 5.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.__idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__created = 0
+        self.__in_use = 0
+        self.__checkouts = 0
+        self.__timeouts = 0
+        self.__wait_total = 0.0
+        self.__wait_max = 0.0
+        self.__closed = False
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def __acquire(self) -> sqlite3.Connection:
+        if self.__closed:
+            raise RuntimeError("connection pool is closed")
+        started = time.perf_counter()
+        try:
+            conn = self.__idle.get_nowait()
+        except queue.Empty:
+            with self.__lock:
+                can_create = self.__created < self.size
+                if can_create:
+                    self.__created += 1
+            if can_create:
+                try:
+                    conn = self.__connect()
+                except Exception:
+                    with self.__lock:
+                        self.__created -= 1
+                    raise
+            else:
+                try:
+                    conn = self.__idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self.__lock:
+                        self.__timeouts += 1
+                    raise TimeoutError(f"no free connection in pool after {self.timeout}s") from None
+        waited = time.perf_counter() - started
+        with self.__lock:
+            self.__in_use += 1
+            self.__checkouts += 1
+            self.__wait_total += waited
+            self.__wait_max = max(self.__wait_max, waited)
+        return conn
+
+    def __release(self, conn: sqlite3.Connection):
+        with self.__lock:
+            self.__in_use -= 1
+            closed = self.__closed
+            if closed:
+                self.__created -= 1
+        if closed:
+            conn.close()
+        else:
+            self.__idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        # a thread keeps the same connection for nested checkouts
+        conn = getattr(self.__local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.__acquire()
+        self.__local.conn = conn
+        try:
+            yield conn
+        finally:
+            self.__local.conn = None
+            self.__release(conn)
+
+    def close(self):
+        # connections still checked out are closed when they are released
+        with self.__lock:
+            self.__closed = True
+        while True:
+            try:
+                conn = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.__lock:
+                self.__created -= 1
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "size": self.size,
+                "created": self.__created,
+                "in_use": self.__in_use,
+                "idle": self.__idle.qsize(),
+                "checkouts": self.__checkouts,
+                "timeouts": self.__timeouts,
+                "wait_avg": self.__wait_total / self.__checkouts if self.__checkouts else 0.0,
+                "wait_max": self.__wait_max,
+            }
+
+
 class DatabaseHelper:
     __database_connection = None
-    __data: str = ''
+    __lock = threading.Lock()
+    __pool: ConnectionPool = None
 
-    def __new__(cls):
-        if cls.__database_connection is None:
-            cls.__database_connection: DatabaseHelper = object.__new__(cls)
-            print('Подключение к БД')
+    def __new__(
+        cls,
+        path: str = "database.sqlite3",
+        pool_size: int = 5,
+        timeout: float = 5.0,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+    ):
+        with cls.__lock:
+            if cls.__database_connection is None:
+                instance: DatabaseHelper = object.__new__(cls)
+                instance.__pool = ConnectionPool(path, pool_size, timeout)
+                instance.__batch_size = batch_size
+                instance.__flush_interval = flush_interval
+                instance.__max_retries = max_retries
+                # buffered entries are (row, failed attempts)
+                instance.__buffer: list[tuple[tuple[str], int]] = []
+                instance.__inflight: list[tuple[tuple[str], int]] = []
+                instance.__dead_letters: list[str] = []
+                instance.__buffer_lock = threading.Lock()
+                instance.__flush_lock = threading.Lock()
+                instance.__timer = None
+                instance.__failed_flushes = 0
+                instance.__last_flush_error: Exception = None
+                with instance.__pool.connection() as conn, conn:
+                    conn.execute("CREATE TABLE IF NOT EXISTS data (id INTEGER PRIMARY KEY, value TEXT)")
+                cls.__database_connection = instance
+                print('Подключение к БД')
         return cls.__database_connection
 
+    def connection(self):
+        return self.__pool.connection()
+
     def select_data(self) -> str:
-        return self.__data
+        # read-your-writes: the newest value may still be waiting in the buffer
+        with self.__buffer_lock:
+            pending = self.__buffer or self.__inflight
+            if pending:
+                return pending[-1][0][0]
+        with self.__pool.connection() as conn:
+            row = conn.execute("SELECT value FROM data ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else ''
 
     def insert_data(self, new_data: str):
-        self.__data = new_data
+        with self.__buffer_lock:
+            self.__buffer.append(((new_data,), 0))
+            full = len(self.__buffer) >= self.__batch_size
+            if not full and self.__timer is None:
+                self.__timer = threading.Timer(self.__flush_interval, self.__flush_quietly)
+                self.__timer.daemon = True
+                self.__timer.start()
+        if full:
+            # the row is buffered either way, so a failed flush is not this caller's error
+            self.__flush_quietly()
+
+    def __insert_each(self, batch: list) -> list:
+        # isolates the rows that fail on their own, so one bad row doesn't sink the batch
+        failed = []
+        with self.__pool.connection() as conn:
+            for entry in batch:
+                try:
+                    with conn:
+                        conn.execute("INSERT INTO data (value) VALUES (?)", entry[0])
+                except sqlite3.Error:
+                    failed.append(entry)
+        return failed
+
+    def flush(self):
+        # the flush lock keeps batches committed in the order they were buffered
+        with self.__flush_lock:
+            with self.__buffer_lock:
+                batch, self.__buffer = self.__buffer, []
+                self.__inflight = batch
+                if self.__timer is not None:
+                    self.__timer.cancel()
+                    self.__timer = None
+            if not batch:
+                return
+            try:
+                try:
+                    with self.__pool.connection() as conn, conn:
+                        conn.executemany("INSERT INTO data (value) VALUES (?)", [row for row, _ in batch])
+                    return
+                except Exception as e:
+                    error = e
+                try:
+                    failed = self.__insert_each(batch)
+                except Exception:
+                    failed = batch
+                if not failed:
+                    return
+                # failed rows go back ahead of anything buffered meanwhile, until they run out of retries
+                retry = self.__max_retries
+                with self.__buffer_lock:
+                    self.__buffer[:0] = [(row, attempts + 1) for row, attempts in failed if attempts + 1 < retry]
+                    self.__dead_letters.extend(row[0] for row, attempts in failed if attempts + 1 >= retry)
+                    self.__failed_flushes += 1
+                    self.__last_flush_error = error
+                raise error
+            finally:
+                with self.__buffer_lock:
+                    self.__inflight = []
+
+    def __flush_quietly(self):
+        # failures are already recorded by flush(); there is no caller to raise to here
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self.__buffer_lock:
+            buffered = len(self.__buffer)
+            failed = self.__failed_flushes
+            dead = len(self.__dead_letters)
+            error = self.__last_flush_error
+        return {
+            **self.__pool.stats(),
+            "buffered": buffered,
+            "failed_flushes": failed,
+            "dead_lettered": dead,
+            "last_flush_error": repr(error) if error is not None else None,
+        }
+
+    def dead_letters(self) -> list[str]:
+        with self.__buffer_lock:
+            return list(self.__dead_letters)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.__pool.close()
 
 
 if __name__ == '__main__':
@@ -21,4 +259,14 @@ if __name__ == '__main__':
     print(connection1.select_data())
     connection2 = DatabaseHelper()
     print(connection2.select_data())
+    print(connection1 is connection2)
 
+    workers = [threading.Thread(target=connection1.insert_data, args=(f"row {i}",)) for i in range(20)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    print(connection2.select_data())
+    connection2.flush()
+    print(connection2.stats())
+    connection2.close()